@@ -1,32 +1,71 @@
-from fastapi import FastAPI, HTTPException, WebSocket
+from fastapi import FastAPI, HTTPException, Query, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
 import asyncio
-import json
+import orjson
 import time
-import random
 import math
-from datetime import datetime
-from typing import Dict, List, Optional
-from pydantic import BaseModel
+import os
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from itertools import count, islice
+from typing import Deque, Dict, List, Optional, Set, Tuple
+from pydantic import BaseModel, TypeAdapter
 import uvicorn
 import logging
+import numpy as np
 from ml_models import ml_detector
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Hydraulic Fault Simulation API", version="2.0.0")
+ALLOWED_ORIGINS = frozenset(["http://localhost:8080", "http://localhost:3000", "http://localhost:5173", "https://hydraulic-fault-dashboard.netlify.app"])
+ALLOWED_METHODS = ["GET", "POST"]
+ALLOWED_HEADERS = ["Content-Type"]
+
+class StreamPreflightMiddleware:
+    """Answer CORS preflight requests for the streaming endpoints from prebuilt headers"""
+    paths = frozenset(["/stream", "/ws"])
+    
+    def __init__(self, app):
+        self.app = app
+        self.preflight_headers = {
+            origin.encode(): [
+                (b"access-control-allow-origin", origin.encode()),
+                (b"access-control-allow-credentials", b"true"),
+                (b"access-control-allow-methods", ", ".join(ALLOWED_METHODS).encode()),
+                (b"access-control-allow-headers", ", ".join(ALLOWED_HEADERS).encode()),
+                (b"access-control-max-age", b"600"),
+                (b"vary", b"Origin"),
+                (b"content-length", b"0")
+            ]
+            for origin in ALLOWED_ORIGINS
+        }
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "OPTIONS" and scope["path"] in self.paths:
+            headers = dict(scope["headers"])
+            preflight_headers = self.preflight_headers.get(headers.get(b"origin"))
+            if preflight_headers is not None and headers.get(b"access-control-request-method", b"").decode() in ALLOWED_METHODS:
+                await send({"type": "http.response.start", "status": 200, "headers": preflight_headers})
+                await send({"type": "http.response.body", "body": b""})
+                return
+        # Anything else, including disallowed preflights, goes through CORSMiddleware
+        await self.app(scope, receive, send)
+
+app = FastAPI(title="Hydraulic Fault Simulation API", version="2.0.0", default_response_class=ORJSONResponse)
 
 # Configure CORS to allow React frontend to connect
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:8080", "http://localhost:3000", "http://localhost:5173", "https://hydraulic-fault-dashboard.netlify.app"],
+    allow_origins=list(ALLOWED_ORIGINS),
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=ALLOWED_METHODS,
+    allow_headers=ALLOWED_HEADERS,
 )
+# Added last so it runs first, ahead of the generic CORS handling
+app.add_middleware(StreamPreflightMiddleware)
 
 # Data models
 class HydraulicData(BaseModel):
@@ -75,14 +114,41 @@ class MaintenanceRecord(BaseModel):
     status: str  # 'completed', 'in_progress', 'scheduled'
     cost: Optional[float] = None
 
+@dataclass(slots=True)
+class HydraulicPoint:
+    """Internal hydraulic reading; converted to HydraulicData at the API boundary"""
+    pressure: float
+    temperature: float
+    flow: float
+    timestamp: int
+
+@dataclass(frozen=True)
+class Snapshot:
+    """Immutable view of the simulation that readers can use without locking"""
+    current_data: Optional[HydraulicPoint]
+    status_json: bytes  # Pre-encoded SystemStatus body for /status
+    ml_prediction_json: Optional[bytes]  # Pre-encoded MLPrediction body for /ml/prediction
+    message: bytes  # Pre-encoded JSON update pushed to /ws clients
+    stream_message: bytes  # The same update framed as an SSE message for /stream
+
+# Serializers built once at import so hot paths skip per-call schema work
+HYDRAULIC_DATA_ADAPTER = TypeAdapter(Optional[HydraulicPoint])
+HYDRAULIC_DATA_LIST_ADAPTER = TypeAdapter(List[HydraulicPoint])
+ALERT_LIST_ADAPTER = TypeAdapter(List[Alert])
+ML_PREDICTION_ADAPTER = TypeAdapter(Optional[MLPrediction])
+SERVICE_LOG_LIST_ADAPTER = TypeAdapter(List[ServiceLogEntry])
+MAINTENANCE_RECORD_LIST_ADAPTER = TypeAdapter(List[MaintenanceRecord])
+
 # ... keep existing code (SimulationState class definition)
 
 class SimulationState:
     def __init__(self):
         self.is_running = False
-        self.current_data: Optional[HydraulicData] = None
-        self.historical_data: List[HydraulicData] = []
-        self.alerts: List[Alert] = []
+        # Set while running; background_simulation parks on it when stopped
+        self.run_event = asyncio.Event()
+        self.current_data: Optional[HydraulicPoint] = None
+        self.historical_data: Deque[HydraulicPoint] = deque(maxlen=200)
+        self.alerts: Deque[Alert] = deque(maxlen=20)
         self.health = "healthy"
         self.fault_state = {
             "type": None,
@@ -90,8 +156,40 @@ class SimulationState:
             "duration": 0
         }
         self.ml_prediction: Optional[MLPrediction] = None
-        self.service_logs: List[ServiceLogEntry] = []
-        self.maintenance_records: List[MaintenanceRecord] = []
+        self.ml_task: Optional[asyncio.Task] = None
+        # Replaced wholesale by publish_snapshot; a single reference assignment is atomic
+        self.latest_snapshot: Optional[Snapshot] = None
+        # Set and replaced on every publish; subscribers wait on the current one
+        self.snapshot_event = asyncio.Event()
+        self.ws_clients: Set[WebSocket] = set()
+        self.service_logs: Deque[ServiceLogEntry] = deque(maxlen=1000)
+        self.maintenance_records: Deque[MaintenanceRecord] = deque(maxlen=500)
+        
+        # Secondary indexes: field name -> field value -> entries in timestamp order
+        self.log_indexes: Dict[str, Dict[str, Deque[ServiceLogEntry]]] = {
+            "event_type": defaultdict(deque),
+            "severity": defaultdict(deque),
+            "component": defaultdict(deque)
+        }
+        self.record_indexes: Dict[str, Dict[str, Deque[MaintenanceRecord]]] = {
+            "maintenance_type": defaultdict(deque),
+            "component": defaultdict(deque),
+            "status": defaultdict(deque)
+        }
+        
+        # Ring buffer of [pressure, temperature, flow] rows fed to the ML model
+        self.feature_buf = np.empty((200, 3), dtype=np.float32)
+        self.buf_head = 0  # next slot to write
+        self.buf_len = 0
+        
+        # Uniform noise in [-0.5, 0.5), sampled in blocks and consumed one row of
+        # three values at a time
+        self.rng = np.random.default_rng()
+        self.noise_buf = self.rng.random((512, 3)) - 0.5
+        self.noise_cursor = 0
+        
+        # Points awaiting anomaly detection, scored in one batch
+        self.pending_points: Deque[HydraulicPoint] = deque()
         
         # Base parameters for normal operation
         self.base_params = {
@@ -102,100 +200,258 @@ class SimulationState:
 
 simulation = SimulationState()
 
+# Number of ticks scored together by the ML anomaly detector
+ML_BATCH_TICKS = 5
+
+def tail(items: Deque, n: int) -> list:
+    """Return the newest n items of a bounded deque as a list"""
+    # Walk from the right so cost scales with n, not with the deque length
+    newest = list(islice(reversed(items), n))
+    newest.reverse()
+    return newest
+
+def publish_snapshot():
+    """Publish the current simulation state as a new immutable snapshot"""
+    current_data = HYDRAULIC_DATA_ADAPTER.dump_python(simulation.current_data)
+    alerts = ALERT_LIST_ADAPTER.dump_python(tail(simulation.alerts, 5))
+    ml_prediction = ML_PREDICTION_ADAPTER.dump_python(simulation.ml_prediction)
+    
+    # Same shape as SystemStatus
+    status = {
+        "health": simulation.health,
+        "is_running": simulation.is_running,
+        "current_data": current_data,
+        "alerts": alerts,
+        "ml_prediction": ml_prediction
+    }
+    message = {
+        "current_data": current_data,
+        "health": simulation.health,
+        "alerts": alerts[-1:],
+        "ml_prediction": ml_prediction
+    }
+    encoded = orjson.dumps(message)
+    simulation.latest_snapshot = Snapshot(
+        simulation.current_data,
+        orjson.dumps(status),
+        orjson.dumps(ml_prediction) if ml_prediction is not None else None,
+        encoded,
+        b"data: " + encoded + b"\n\n"
+    )
+    
+    # Wake everything waiting for this snapshot; later waiters get a fresh event
+    event, simulation.snapshot_event = simulation.snapshot_event, asyncio.Event()
+    event.set()
+
+def _insert_by_timestamp(entries: Deque, entry):
+    """Insert entry keeping entries sorted by timestamp; O(1) for in-order entries"""
+    i = len(entries)
+    while i and entries[i - 1].timestamp > entry.timestamp:
+        i -= 1
+    entries.insert(i, entry)
+
+def index_entry(entries: Deque, indexes: Dict[str, Dict[str, Deque]], entry):
+    """Add an entry to a bounded deque and its secondary indexes, evicting the oldest"""
+    if len(entries) == entries.maxlen:
+        evicted = entries.popleft()
+        for field, index in indexes.items():
+            key = getattr(evicted, field)
+            index[key].popleft()
+            # Keys can be client-supplied; drop empty buckets so indexes stay bounded
+            if not index[key]:
+                del index[key]
+    
+    _insert_by_timestamp(entries, entry)
+    for field, index in indexes.items():
+        _insert_by_timestamp(index[getattr(entry, field)], entry)
+
+def query_indexed(entries: Deque, indexes: Dict[str, Dict[str, Deque]], filters: Dict[str, Optional[str]], limit: int, offset: int) -> Tuple[list, int]:
+    """Return a newest-first page of the entries matching all filters and the match count"""
+    active = {field: value for field, value in filters.items() if value}
+    if not active:
+        source = entries
+    else:
+        # Start from the smallest index bucket among the requested filters
+        source = min((indexes[field].get(value, ()) for field, value in active.items()), key=len)
+    
+    if len(active) <= 1:
+        return list(islice(reversed(source), offset, offset + limit)), len(source)
+    
+    # Count every match but keep only the requested page
+    page = []
+    total = 0
+    for entry in reversed(source):
+        if all(getattr(entry, field) == value for field, value in active.items()):
+            if offset <= total < offset + limit:
+                page.append(entry)
+            total += 1
+    return page, total
+
+def record_features(data: HydraulicPoint):
+    """Write a data point into the ML feature ring buffer"""
+    simulation.feature_buf[simulation.buf_head] = (data.pressure, data.temperature, data.flow)
+    simulation.buf_head = (simulation.buf_head + 1) % len(simulation.feature_buf)
+    simulation.buf_len = min(simulation.buf_len + 1, len(simulation.feature_buf))
+
+def feature_window(n: int) -> np.ndarray:
+    """Return the newest n rows of the feature ring buffer, oldest first"""
+    n = min(n, simulation.buf_len)
+    start = simulation.buf_head - n
+    if start >= 0:
+        # Contiguous rows - return a view without copying
+        return simulation.feature_buf[start:simulation.buf_head]
+    return np.concatenate((simulation.feature_buf[start:], simulation.feature_buf[:simulation.buf_head]))
+
+publish_snapshot()
+
 # ... keep existing code (generate_normal_data, apply_fault_signature, detect_anomalies_ml, detect_anomalies_threshold, update_ml_prediction functions)
 
-def generate_normal_data() -> HydraulicData:
+# Per-process sequence for log, alert and maintenance record IDs
+_id_counter = count(1)
+
+def next_id() -> str:
+    """Return a unique ID; the pid prefix keeps IDs distinct across workers"""
+    return f"{os.getpid():x}-{next(_id_counter):08x}"
+
+def points_array(points: List[HydraulicPoint]) -> np.ndarray:
+    """Stack time-ordered points into an (n, 3) array of pressure, temperature and flow"""
+    return np.array([(point.pressure, point.temperature, point.flow) for point in points])
+
+def current_time_ms() -> int:
+    """Current wall-clock time in integer milliseconds"""
+    return time.time_ns() // 1_000_000
+
+def next_noise() -> List[float]:
+    """Return the next three uniform noise samples in [-0.5, 0.5)"""
+    if simulation.noise_cursor == len(simulation.noise_buf):
+        simulation.rng.random(out=simulation.noise_buf)
+        simulation.noise_buf -= 0.5
+        simulation.noise_cursor = 0
+    
+    row = simulation.noise_buf[simulation.noise_cursor].tolist()
+    simulation.noise_cursor += 1
+    return row
+
+def generate_normal_data(now_ms: Optional[int] = None) -> HydraulicPoint:
     """Generate normal hydraulic data with natural variation"""
-    now = int(time.time() * 1000)
+    now = now_ms if now_ms is not None else current_time_ms()
     
     # Add some natural variation
-    pressure = simulation.base_params["pressure"] + (random.random() - 0.5) * 10
-    temperature = simulation.base_params["temperature"] + (random.random() - 0.5) * 8
-    flow = simulation.base_params["flow"] + (random.random() - 0.5) * 6
-
-    return HydraulicData(
-        pressure=max(0, pressure),
-        temperature=max(0, temperature),
-        flow=max(0, flow),
+    pressure_noise, temperature_noise, flow_noise = next_noise()
+    pressure = simulation.base_params["pressure"] + pressure_noise * 10
+    temperature = simulation.base_params["temperature"] + temperature_noise * 8
+    flow = simulation.base_params["flow"] + flow_noise * 6
+
+    return HydraulicPoint(
+        pressure=max(0.0, pressure),
+        temperature=max(0.0, temperature),
+        flow=max(0.0, flow),
         timestamp=now
     )
 
-def apply_fault_signature(data: HydraulicData, fault_type: str, intensity: float) -> HydraulicData:
+# Health states indexed by the integer codes the detectors compute
+HEALTH_STATES = ("healthy", "warning", "fault")
+
+# Per-column (pressure, temperature, flow) bounds for the threshold fallback
+NORMAL_LOW = np.array([140, 70, 45])
+NORMAL_HIGH = np.array([160, 90, 55])
+FAULT_DEVIATION = np.array([30, 20, 15])
+
+def _pressure_drop(data: HydraulicPoint, intensity: float) -> HydraulicPoint:
+    """Simulate leak - gradual pressure drop"""
+    return HydraulicPoint(
+        pressure=max(80.0, data.pressure - intensity * 40),
+        temperature=data.temperature,
+        flow=data.flow,
+        timestamp=data.timestamp
+    )
+
+def _temperature_spike(data: HydraulicPoint, intensity: float) -> HydraulicPoint:
+    """Simulate overheating"""
+    return HydraulicPoint(
+        pressure=data.pressure,
+        temperature=data.temperature + intensity * 30,
+        flow=data.flow,
+        timestamp=data.timestamp
+    )
+
+def _flow_disruption(data: HydraulicPoint, intensity: float) -> HydraulicPoint:
+    """Simulate cavitation - erratic flow"""
+    return HydraulicPoint(
+        pressure=data.pressure,
+        temperature=data.temperature,
+        flow=data.flow + next_noise()[2] * intensity * 30,
+        timestamp=data.timestamp
+    )
+
+def _random_noise(data: HydraulicPoint, intensity: float) -> HydraulicPoint:
+    """Simulate sensor malfunction"""
+    pressure_noise, temperature_noise, flow_noise = next_noise()
+    return HydraulicPoint(
+        pressure=data.pressure + pressure_noise * intensity * 20,
+        temperature=data.temperature + temperature_noise * intensity * 15,
+        flow=data.flow + flow_noise * intensity * 15,
+        timestamp=data.timestamp
+    )
+
+# One specialized function per fault type, each touching only the fields it changes
+FAULT_FNS = {
+    "pressure_drop": _pressure_drop,
+    "temperature_spike": _temperature_spike,
+    "flow_disruption": _flow_disruption,
+    "random_noise": _random_noise
+}
+
+def apply_fault_signature(data: HydraulicPoint, fault_type: str, intensity: float) -> HydraulicPoint:
     """Apply fault signatures to the data based on fault type and intensity"""
-    faulted_data = data.dict()
-
-    if fault_type == "pressure_drop":
-        # Simulate leak - gradual pressure drop
-        faulted_data["pressure"] = max(80, data.pressure - intensity * 40)
-    elif fault_type == "temperature_spike":
-        # Simulate overheating
-        faulted_data["temperature"] = data.temperature + intensity * 30
-    elif fault_type == "flow_disruption":
-        # Simulate cavitation - erratic flow
-        faulted_data["flow"] = data.flow + (random.random() - 0.5) * intensity * 30
-    elif fault_type == "random_noise":
-        # Simulate sensor malfunction
-        faulted_data["pressure"] += (random.random() - 0.5) * intensity * 20
-        faulted_data["temperature"] += (random.random() - 0.5) * intensity * 15
-        faulted_data["flow"] += (random.random() - 0.5) * intensity * 15
-
-    return HydraulicData(**faulted_data)
-
-def detect_anomalies_ml(data: HydraulicData) -> str:
-    """ML-based anomaly detection using Isolation Forest"""
+    fault_fn = FAULT_FNS.get(fault_type)
+    return fault_fn(data, intensity) if fault_fn else data
+
+def detect_anomalies_ml(batch: List[HydraulicPoint]) -> List[str]:
+    """ML-based anomaly detection using Isolation Forest, one health state per point"""
     try:
-        # Use recent historical data for context
-        recent_data = simulation.historical_data[-20:] if len(simulation.historical_data) >= 20 else simulation.historical_data
-        recent_data.append(data)
-        
-        # Convert to dict format for ML model
-        data_dicts = [point.dict() for point in recent_data]
+        # Score the batch together with the 20 points before it for context;
+        # record_features has already written the batch into the ring buffer
+        window = feature_window(20 + len(batch))
         
         # Get ML predictions
-        anomaly_labels, anomaly_scores = ml_detector.predict(data_dicts)
+        anomaly_labels, anomaly_scores = ml_detector.predict_array(window)
         
-        if not anomaly_labels:
+        if not anomaly_labels.size:
             # Fallback to threshold-based detection
-            return detect_anomalies_threshold(data)
-        
-        # Check the latest prediction
-        latest_label = anomaly_labels[-1]
-        latest_score = anomaly_scores[-1]
+            return detect_anomalies_threshold(batch)
         
-        # Determine health based on ML prediction
-        if latest_label == -1:  # Anomaly detected
-            if latest_score < -0.3:
-                return "fault"
-            else:
-                return "warning"
-        else:
-            return "healthy"
+        # Determine health from the predictions for the batch rows: anomalies
+        # scoring below -0.3 are faults, other anomalies warnings
+        labels = anomaly_labels[-len(batch):]
+        scores = anomaly_scores[-len(batch):]
+        codes = np.where(labels == -1, np.where(scores < -0.3, 2, 1), 0)
+        return [HEALTH_STATES[code] for code in codes.tolist()]
             
     except Exception as e:
         logger.error(f"ML anomaly detection failed: {e}")
         # Fallback to threshold-based detection
-        return detect_anomalies_threshold(data)
-
-def detect_anomalies_threshold(data: HydraulicData) -> str:
-    """Fallback threshold-based anomaly detection"""
-    pressure_normal = 140 <= data.pressure <= 160
-    temperature_normal = 70 <= data.temperature <= 90
-    flow_normal = 45 <= data.flow <= 55
-
-    if not (pressure_normal and temperature_normal and flow_normal):
-        pressure_deviation = abs(data.pressure - simulation.base_params["pressure"])
-        temp_deviation = abs(data.temperature - simulation.base_params["temperature"])
-        flow_deviation = abs(data.flow - simulation.base_params["flow"])
-
-        if pressure_deviation > 30 or temp_deviation > 20 or flow_deviation > 15:
-            return "fault"
-        else:
-            return "warning"
-
-    return "healthy"
+        return detect_anomalies_threshold(batch)
+
+def _threshold_vec(features: np.ndarray, base: np.ndarray) -> np.ndarray:
+    """Return an int8 index into HEALTH_STATES for each (pressure, temperature, flow) row"""
+    outside_normal = ((features < NORMAL_LOW) | (features > NORMAL_HIGH)).any(axis=1)
+    large_deviation = (np.abs(features - base) > FAULT_DEVIATION).any(axis=1)
+    return np.select(
+        [outside_normal & large_deviation, outside_normal], [2, 1], default=0
+    ).astype(np.int8)
+
+def detect_anomalies_threshold(batch: List[HydraulicPoint]) -> List[str]:
+    """Fallback threshold-based anomaly detection, one health state per point"""
+    base = simulation.base_params
+    codes = _threshold_vec(
+        points_array(batch),
+        np.array([base["pressure"], base["temperature"], base["flow"]])
+    )
+    return [HEALTH_STATES[code] for code in codes.tolist()]
 
-def update_ml_prediction():
-    """Update ML-based failure prediction"""
+async def update_ml_prediction():
+    """Update ML-based failure prediction without blocking the event loop"""
     try:
         if len(simulation.historical_data) < 10:
             simulation.ml_prediction = MLPrediction(
@@ -207,8 +463,8 @@ def update_ml_prediction():
             return
         
         # Get recent data for prediction
-        recent_data = [point.dict() for point in simulation.historical_data[-50:]]
-        prediction_result = ml_detector.predict_failure_timeline(recent_data)
+        recent_data = points_array(tail(simulation.historical_data, 50))
+        prediction_result = await asyncio.to_thread(ml_detector.predict_failure_timeline, recent_data)
         
         simulation.ml_prediction = MLPrediction(**prediction_result)
         
@@ -220,12 +476,14 @@ def update_ml_prediction():
             risk_level="error",
             trend_analysis=f"Error in ML prediction: {str(e)}"
         )
+    finally:
+        publish_snapshot()
 
-def add_service_log(event_type: str, severity: str, component: str, message: str, details: Optional[Dict] = None, user_id: Optional[str] = None):
+def add_service_log(event_type: str, severity: str, component: str, message: str, details: Optional[Dict] = None, user_id: Optional[str] = None, now_ms: Optional[int] = None):
     """Add a service log entry"""
     log_entry = ServiceLogEntry(
-        id=str(random.randint(100000, 999999)),
-        timestamp=int(time.time() * 1000),
+        id=next_id(),
+        timestamp=now_ms if now_ms is not None else current_time_ms(),
         event_type=event_type,
         severity=severity,
         component=component,
@@ -233,21 +491,20 @@ def add_service_log(event_type: str, severity: str, component: str, message: str
         details=details,
         user_id=user_id
     )
-    simulation.service_logs.append(log_entry)
-    # Keep only last 1000 log entries
-    simulation.service_logs = simulation.service_logs[-1000:]
+    # Bounded deque keeps only the last 1000 log entries
+    index_entry(simulation.service_logs, simulation.log_indexes, log_entry)
 
-def add_alert(alert_type: str, message: str):
+def add_alert(alert_type: str, message: str, now_ms: Optional[int] = None):
     """Add an alert to the simulation state"""
     alert = Alert(
-        id=str(random.randint(100000, 999999)),
+        id=next_id(),
         type=alert_type,
         message=message,
-        timestamp=int(time.time() * 1000)
+        timestamp=now_ms if now_ms is not None else current_time_ms()
     )
+    # Bounded deque keeps only the last 20 alerts
     simulation.alerts.append(alert)
-    # Keep only last 20 alerts
-    simulation.alerts = simulation.alerts[-20:]
+    publish_snapshot()
     
     # Also add to service logs
     add_service_log(
@@ -255,16 +512,35 @@ def add_alert(alert_type: str, message: str):
         severity=alert_type,
         component="hydraulic_system",
         message=f"Alert generated: {message}",
-        details={"alert_id": alert.id}
+        details={"alert_id": alert.id},
+        now_ms=alert.timestamp
     )
 
+def update_health(data: HydraulicPoint, new_health: str, now_ms: Optional[int] = None):
+    """Record a new health state, generating alerts on changes"""
+    if new_health != simulation.health:
+        if new_health == "fault":
+            add_alert("error", f"ML Model detected system fault! Pressure: {data.pressure:.1f} PSI, Temp: {data.temperature:.1f}°C, Flow: {data.flow:.1f} L/min", now_ms=now_ms)
+        elif new_health == "warning":
+            add_alert("warning", "ML Model detected anomaly - system parameters show unusual patterns", now_ms=now_ms)
+        elif new_health == "healthy":
+            add_alert("info", "System returned to normal operation", now_ms=now_ms)
+        
+        simulation.health = new_health
+
+def schedule_ml_prediction():
+    """Run update_ml_prediction in the background unless one is already in flight"""
+    if simulation.ml_task is None or simulation.ml_task.done():
+        simulation.ml_task = asyncio.create_task(update_ml_prediction())
+
 def generate_data_point():
     """Generate a single data point with potential fault injection"""
-    data = generate_normal_data()
+    now = current_time_ms()
+    data = generate_normal_data(now)
     
     # Apply fault if active
     if simulation.fault_state["type"]:
-        fault_age = time.time() * 1000 - simulation.fault_state["start_time"]
+        fault_age = now - simulation.fault_state["start_time"]
         intensity = min(fault_age / simulation.fault_state["duration"], 1.0)
         
         data = apply_fault_signature(data, simulation.fault_state["type"], intensity)
@@ -272,31 +548,26 @@ def generate_data_point():
         # Clear fault after duration
         if fault_age >= simulation.fault_state["duration"]:
             simulation.fault_state = {"type": None, "start_time": 0, "duration": 0}
-            add_alert("info", "Fault condition cleared - returning to normal operation")
-
-    # Use ML-based anomaly detection
-    new_health = detect_anomalies_ml(data)
-    
-    # Generate alerts on health changes
-    if new_health != simulation.health:
-        if new_health == "fault":
-            add_alert("error", f"ML Model detected system fault! Pressure: {data.pressure:.1f} PSI, Temp: {data.temperature:.1f}°C, Flow: {data.flow:.1f} L/min")
-        elif new_health == "warning":
-            add_alert("warning", "ML Model detected anomaly - system parameters show unusual patterns")
-        elif new_health == "healthy":
-            add_alert("info", "System returned to normal operation")
-        
-        simulation.health = new_health
+            add_alert("info", "Fault condition cleared - returning to normal operation", now_ms=now)
 
+    record_features(data)
     simulation.current_data = data
+    # Bounded deque keeps the last 200 points
     simulation.historical_data.append(data)
     
-    # Keep last 200 points
-    simulation.historical_data = simulation.historical_data[-200:]
+    # Use ML-based anomaly detection, scoring ML_BATCH_TICKS points per model call
+    simulation.pending_points.append(data)
+    if len(simulation.pending_points) >= ML_BATCH_TICKS:
+        batch = list(simulation.pending_points)
+        simulation.pending_points.clear()
+        for point, new_health in zip(batch, detect_anomalies_ml(batch)):
+            update_health(point, new_health, now_ms=point.timestamp)
     
     # Update ML prediction every 10 data points
     if len(simulation.historical_data) % 10 == 0:
-        update_ml_prediction()
+        schedule_ml_prediction()
+    
+    publish_snapshot()
 
 # API Endpoints
 @app.get("/")
@@ -306,100 +577,77 @@ def root():
 @app.get("/status", response_model=SystemStatus)
 async def get_status():
     """Get current system status including ML predictions"""
-    return SystemStatus(
-        health=simulation.health,
-        is_running=simulation.is_running,
-        current_data=simulation.current_data,
-        alerts=simulation.alerts[-5:],
-        ml_prediction=simulation.ml_prediction
-    )
+    return Response(simulation.latest_snapshot.status_json, media_type="application/json")
 
 @app.get("/data/current", response_model=HydraulicData)
 async def get_current_data():
     """Get current hydraulic data point"""
-    if not simulation.current_data:
+    current_data = simulation.latest_snapshot.current_data
+    if not current_data:
         raise HTTPException(status_code=404, detail="No data available")
-    return simulation.current_data
+    return Response(HYDRAULIC_DATA_ADAPTER.dump_json(current_data), media_type="application/json")
 
 @app.get("/data/historical")
 async def get_historical_data():
     """Get historical hydraulic data"""
-    return simulation.historical_data[-50:]
+    return Response(HYDRAULIC_DATA_LIST_ADAPTER.dump_json(tail(simulation.historical_data, 50)), media_type="application/json")
 
 @app.get("/service-logs")
 async def get_service_logs(
     event_type: Optional[str] = None,
     severity: Optional[str] = None,
     component: Optional[str] = None,
-    limit: int = 100,
-    offset: int = 0
+    limit: int = Query(100, ge=0),
+    offset: int = Query(0, ge=0)
 ):
-    """Get service logs with optional filtering"""
-    logs = simulation.service_logs.copy()
-    
-    # Apply filters
-    if event_type:
-        logs = [log for log in logs if log.event_type == event_type]
-    if severity:
-        logs = [log for log in logs if log.severity == severity]
-    if component:
-        logs = [log for log in logs if log.component == component]
-    
-    # Sort by timestamp (newest first)
-    logs.sort(key=lambda x: x.timestamp, reverse=True)
-    
-    # Apply pagination
-    total = len(logs)
-    logs = logs[offset:offset + limit]
+    """Get service logs with optional filtering, newest first"""
+    logs, total = query_indexed(
+        simulation.service_logs,
+        simulation.log_indexes,
+        {"event_type": event_type, "severity": severity, "component": component},
+        limit,
+        offset
+    )
     
-    return {
-        "logs": logs,
+    return ORJSONResponse({
+        "logs": SERVICE_LOG_LIST_ADAPTER.dump_python(logs),
         "total": total,
         "limit": limit,
         "offset": offset
-    }
+    })
 
 @app.get("/maintenance-records")
 async def get_maintenance_records(
     maintenance_type: Optional[str] = None,
     component: Optional[str] = None,
     status: Optional[str] = None,
-    limit: int = 50,
-    offset: int = 0
+    limit: int = Query(50, ge=0),
+    offset: int = Query(0, ge=0)
 ):
-    """Get maintenance records with optional filtering"""
-    records = simulation.maintenance_records.copy()
-    
-    # Apply filters
-    if maintenance_type:
-        records = [record for record in records if record.maintenance_type == maintenance_type]
-    if component:
-        records = [record for record in records if record.component == component]
-    if status:
-        records = [record for record in records if record.status == status]
-    
-    # Sort by timestamp (newest first)
-    records.sort(key=lambda x: x.timestamp, reverse=True)
-    
-    # Apply pagination
-    total = len(records)
-    records = records[offset:offset + limit]
+    """Get maintenance records with optional filtering, newest first"""
+    records, total = query_indexed(
+        simulation.maintenance_records,
+        simulation.record_indexes,
+        {"maintenance_type": maintenance_type, "component": component, "status": status},
+        limit,
+        offset
+    )
     
-    return {
-        "records": records,
+    return ORJSONResponse({
+        "records": MAINTENANCE_RECORD_LIST_ADAPTER.dump_python(records),
         "total": total,
         "limit": limit,
         "offset": offset
-    }
+    })
 
 @app.post("/maintenance-records")
 async def create_maintenance_record(record: MaintenanceRecord):
     """Create a new maintenance record"""
     # Generate ID if not provided
     if not record.id:
-        record.id = str(random.randint(100000, 999999))
+        record.id = next_id()
     
-    simulation.maintenance_records.append(record)
+    index_entry(simulation.maintenance_records, simulation.record_indexes, record)
     
     # Add to service logs
     add_service_log(
@@ -418,11 +666,11 @@ async def train_ml_model():
     try:
         if len(simulation.historical_data) < 50:
             # Use synthetic data for training
-            success = ml_detector.train()
+            success = await asyncio.to_thread(ml_detector.train)
         else:
             # Use actual historical data
-            training_data = [point.dict() for point in simulation.historical_data]
-            success = ml_detector.train(training_data)
+            training_data = points_array(simulation.historical_data)
+            success = await asyncio.to_thread(ml_detector.train, training_data)
         
         if success:
             add_alert("info", "ML model training completed successfully")
@@ -434,7 +682,7 @@ async def train_ml_model():
                 details={"data_points": len(simulation.historical_data)}
             )
             # Update prediction after training
-            update_ml_prediction()
+            await update_ml_prediction()
             return {"message": "ML model trained successfully", "data_points": len(simulation.historical_data)}
         else:
             raise HTTPException(status_code=500, detail="ML model training failed")
@@ -452,18 +700,20 @@ async def train_ml_model():
 @app.get("/ml/prediction", response_model=MLPrediction)
 async def get_ml_prediction():
     """Get current ML-based failure prediction"""
-    if simulation.ml_prediction is None:
-        update_ml_prediction()
+    if simulation.latest_snapshot.ml_prediction_json is None:
+        await update_ml_prediction()
     
-    if simulation.ml_prediction is None:
+    ml_prediction_json = simulation.latest_snapshot.ml_prediction_json
+    if ml_prediction_json is None:
         raise HTTPException(status_code=404, detail="ML prediction not available")
     
-    return simulation.ml_prediction
+    return Response(ml_prediction_json, media_type="application/json")
 
 @app.post("/simulation/start")
 async def start_simulation():
     """Start the simulation"""
     simulation.is_running = True
+    simulation.run_event.set()
     add_alert("info", "Hydraulic simulation started with ML integration")
     add_service_log(
         event_type="system",
@@ -477,6 +727,7 @@ async def start_simulation():
 async def stop_simulation():
     """Stop the simulation"""
     simulation.is_running = False
+    simulation.run_event.clear()
     add_alert("info", "Hydraulic simulation stopped")
     add_service_log(
         event_type="system",
@@ -491,8 +742,11 @@ async def reset_simulation():
     """Reset the simulation state"""
     simulation.fault_state = {"type": None, "start_time": 0, "duration": 0}
     simulation.health = "healthy"
-    simulation.historical_data = []
-    simulation.alerts = []
+    simulation.historical_data.clear()
+    simulation.alerts.clear()
+    simulation.buf_head = 0
+    simulation.buf_len = 0
+    simulation.pending_points.clear()
     simulation.ml_prediction = None
     add_alert("info", "System reset completed - all parameters restored to normal")
     add_service_log(
@@ -506,14 +760,14 @@ async def reset_simulation():
 @app.post("/faults/inject/{fault_type}")
 async def inject_fault(fault_type: str):
     """Inject a specific fault type"""
-    valid_faults = ["pressure_drop", "temperature_spike", "flow_disruption", "random_noise"]
+    valid_faults = list(FAULT_FNS)
     
     if fault_type not in valid_faults:
         raise HTTPException(status_code=400, detail=f"Invalid fault type. Must be one of: {valid_faults}")
     
     simulation.fault_state = {
         "type": fault_type,
-        "start_time": time.time() * 1000,
+        "start_time": current_time_ms(),
         "duration": 15000  # 15 seconds
     }
 
@@ -538,31 +792,19 @@ async def inject_fault(fault_type: str):
 async def stream_data():
     """Stream real-time data updates"""
     async def generate():
+        # background_simulation produces the data; this relays each published snapshot
         while simulation.is_running:
-            generate_data_point()
-            
-            data = {
-                "current_data": simulation.current_data.dict() if simulation.current_data else None,
-                "health": simulation.health,
-                "alerts": [alert.dict() for alert in simulation.alerts[-1:]],
-                "ml_prediction": simulation.ml_prediction.dict() if simulation.ml_prediction else None
-            }
-            
-            yield f"data: {json.dumps(data)}\n\n"
-            await asyncio.sleep(1)
+            event = simulation.snapshot_event
+            yield simulation.latest_snapshot.stream_message
+            await event.wait()
     
-    return StreamingResponse(generate(), media_type="text/plain")
+    return StreamingResponse(generate(), media_type="text/event-stream")
 
 @app.on_event("startup")
 async def startup_event():
-    """Initialize ML model and start background simulation"""
+    """Start background simulation; the ML model is loaded when ml_models is imported"""
     logger.info("Starting up Hydraulic Fault Simulation API...")
     
-    # Try to load existing ML model, otherwise train a new one
-    if not ml_detector.load_model():
-        logger.info("No existing ML model found. Training new model...")
-        ml_detector.train()
-    
     # Add startup log
     add_service_log(
         event_type="system",
@@ -571,15 +813,53 @@ async def startup_event():
         message="Hydraulic Fault Simulation API started successfully"
     )
     
-    # Start background simulation task
+    # Start background simulation and WebSocket broadcast tasks
     asyncio.create_task(background_simulation())
+    asyncio.create_task(broadcast_snapshots())
 
 async def background_simulation():
     """Background task that generates data when simulation is running"""
+    loop = asyncio.get_running_loop()
+    # Create the event on the serving loop, carrying over a start that came first
+    run_event = asyncio.Event()
+    if simulation.is_running:
+        run_event.set()
+    simulation.run_event = run_event
+    next_tick = loop.time()
     while True:
-        if simulation.is_running:
-            generate_data_point()
-        await asyncio.sleep(1)
+        if not run_event.is_set():
+            # Park until /simulation/start instead of waking every second
+            await run_event.wait()
+            next_tick = loop.time()
+        generate_data_point()
+        
+        # Sleep to a monotonic deadline so tick work doesn't accumulate as drift;
+        # if a tick overran the deadline, skip ahead instead of bursting
+        next_tick += 1.0
+        delay = next_tick - loop.time()
+        if delay < 0:
+            next_tick = loop.time()
+            delay = 0
+        await asyncio.sleep(delay)
+
+async def broadcast_snapshots():
+    """Background task that pushes each published snapshot to WebSocket clients"""
+    # Create the event on the serving loop; asyncio events bind to the first loop that waits
+    simulation.snapshot_event = event = asyncio.Event()
+    while True:
+        await event.wait()
+        # Take the next event before sending so no publish is missed meanwhile
+        event = simulation.snapshot_event
+        if not simulation.ws_clients:
+            continue
+        
+        # Encode once, fan out to every client
+        text = simulation.latest_snapshot.message.decode()
+        clients = list(simulation.ws_clients)
+        results = await asyncio.gather(*(ws.send_text(text) for ws in clients), return_exceptions=True)
+        for ws, result in zip(clients, results):
+            if isinstance(result, Exception):
+                simulation.ws_clients.discard(ws)
 
 @app.get("/health")
 async def health():
@@ -587,11 +867,18 @@ async def health():
 
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
+    """Stream real-time data updates, one message per published snapshot"""
     await websocket.accept()
-    await websocket.send_text("WebSocket connection established")
-    while True:
-        data = await websocket.receive_text()
-        await websocket.send_text(f"Message received: {data}")
+    simulation.ws_clients.add(websocket)
+    try:
+        await websocket.send_text(simulation.latest_snapshot.message.decode())
+        # Incoming messages are ignored; iteration ends when the client disconnects
+        async for _ in websocket.iter_text():
+            pass
+    finally:
+        simulation.ws_clients.discard(websocket)
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    # SimulationState is per-process; UVICORN_WORKERS > 1 runs independent simulations
+    workers = int(os.environ.get("UVICORN_WORKERS", 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=workers)
@@ -3,4 +3,7 @@ import os
 
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 8000))
-    uvicorn.run("main:app", host="0.0.0.0", port=port)
+    # Simulation state lives in each worker process, so only scale out
+    # when running several independent simulations is acceptable
+    workers = int(os.environ.get("UVICORN_WORKERS", 1))
+    uvicorn.run("main:app", host="0.0.0.0", port=port, workers=workers)